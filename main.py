@@ -1,17 +1,17 @@
 import datetime as dt
-import csv
-import copy
+import functools
 import matplotlib.pyplot as plt
+import multiprocessing
 import numpy as np
+import numba
 import os
 import pandas as pd
 import ipywidgets as widgets
-import pytz
 import random
+import time
 import yfinance as yf
 from calendar import monthrange
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+from concurrent.futures import ProcessPoolExecutor
 from IPython.display import clear_output, Markdown
 from prettytable import PrettyTable
 
@@ -26,6 +26,17 @@ PRICES_FILE = f'{os.path.dirname(os.path.abspath(__file__))}/px_etf.csv'
 TRANSACTIONS_FILE = f'{os.path.dirname(os.path.abspath(__file__))}/tx_etf.csv'
 MARKET_TICKER = '^GSPC'
 MARKET_FILE = 'gspc.csv' # In case yfinance doesnt work, a csv file with the market data will be used instead
+MARKET_CACHE_DIR = os.path.dirname(os.path.abspath(__file__)) # Fetched market data is cached here between runs
+MARKET_CACHE_TTL = 24 * 60 * 60 # Seconds after which the cached market data is fetched again
+
+# Format of each value of a row of the profit table
+ROW_FORMATS = (
+	'%.2f', '%.4f', # Realized profits
+	'%.2f', '%.4f', # Unrealized profits
+	'%.2f', '%.4f', # Total profits
+	'%.2f', '%.2f', '%.2f', # Cash, portfolio, assets
+	'%.2f', '%.4f', '%.4f', '%.4f', # Std, beta, alpha, Sharpe ratio
+)
 
 NUM_OF_X_TICKS = 30
 RISK_FREE_RATE = 0.02
@@ -33,9 +44,13 @@ RISK_FREE_RATE = 0.02
 # Read prices and available Tickers
 all_tickers = [] # List of all tickers which appear in PRICES_FILE
 update_dates = [] # List of all dates which appear in PRICES_FILE
-price_daily = {} # Nested dictionary of prices for each ticker on each day
+PRICES = None # float32 matrix of end-of-day prices, rows are dates and columns are tickers
+DATE_IDX = {} # Maps (year, month, day) to the row of that date in PRICES
+DATE_KEYS = None # Dates of the rows of PRICES packed as YYYYMMDD integers, ascending like the rows of PRICES_FILE
+TICKER_IDX = {} # Maps a ticker to its column in PRICES
 tickers_interested = [] # List of tickers which the user is interested in
 MARKET_DATA = None
+MARKET_CLOSE = None # Closing price of the market on each date in PRICES, NaN if the market has no price that day
 
 # Classes
 class Buy():
@@ -47,13 +62,12 @@ class Buy():
 		ticker: A string representing the ticker symbol of the stock.
 		price: A float representing the price per share.
 		qty: An integer representing the quantity of shares.
-
-	Methods:
-		cost: Returns the total cost of the buy order.
+		cost: A float representing the total cost of the buy order.
 	"""
 	def __init__(self, ticker: str, price: float, qty: int):
 		"""
 		Initializes a Buy instance with a ticker symbol, price per share, and quantity of shares.
+		The total cost is computed once here since the order never changes.
 
 		Args:
 			ticker: A string representing the ticker symbol of the stock.
@@ -63,17 +77,7 @@ class Buy():
 		self.ticker = ticker
 		self.price = price
 		self.qty = qty
-
-	@property
-	def cost(self):
-		"""
-		Returns the total cost of the buy order.
-		This method multiplies the price per share by the quantity of shares to calculate the total cost.
-
-		Returns:
-			A float representing the total cost of the buy order.
-		"""
-		return self.price * self.qty
+		self.cost = price * qty
 
 class Sell():
 	"""
@@ -109,30 +113,61 @@ class Sell():
 class TradeHistory():
 	"""
 	Represents a history of trade orders.
-	This class holds the history of buy and sell orders, organized by date and ticker symbol.
+	This class holds the history of buy and sell orders as columnar logs,
+			one array per field, where the orders are stored in the order they were added.
+	The arrays grow by doubling their capacity when they are full, only the first n_buys / n_sells entries are valid.
 
 	Attributes:
-		buy_history: A nested dictionary where the first level keys are years,
-				the second level keys are months, the third level keys are days,
-				and the fourth level keys are ticker symbols.
-				The values are Buy instances.
-		sell_history: A nested dictionary where the first level keys are years,
-				the second level keys are months, the third level keys are days, and the fourth level keys are ticker symbols.
-				The values are Sell instances.
+		n_buys: An integer representing the number of buy orders in the history.
+		buy_date_id: An array of integers representing the row in PRICES of the date of each buy order.
+		buy_ticker_id: An array of integers representing the column in PRICES of the ticker of each buy order.
+		buy_price: An array of floats representing the price per share of each buy order.
+		buy_qty: An array of integers representing the quantity of shares of each buy order.
+		n_sells: An integer representing the number of sell orders in the history.
+		sell_date_id: An array of integers representing the row in PRICES of the date of each sell order.
+		sell_ticker_id: An array of integers representing the column in PRICES of the ticker of each sell order.
+		sell_price: An array of floats representing the price per share of each sell order.
+		sell_qty: An array of integers representing the quantity of shares of each sell order.
+		sell_profit: An array of floats representing the profit made from each sell order.
+		sell_cost: An array of floats representing the cost of the shares of each sell order.
+		sells_sorted: A boolean representing whether the sell log is sorted by date.
+		cum_profits: A cache of the running profits of cumulative_profits_costs, None if it has to be recomputed.
+		cum_costs: A cache of the running costs of cumulative_profits_costs, None if it has to be recomputed.
 
 	Methods:
 		add_buy: Adds a buy order to the history.
+		add_buys: Adds many buy orders to the history at once.
 		add_sell: Adds a sell order to the history.
+		add_sells: Adds many sell orders to the history at once.
 		get_buy: Retrieves a buy order from the history.
 		get_sell: Retrieves a sell order from the history.
+		sort_by_date: Sorts the sell log by date.
+		cumulative_profits_costs: Returns the running totals of the profits and costs of the sell log, per ticker.
+		profits_costs_by_date: Calculates the total profits and costs of the sell orders on each date.
 		sum_profits_costs: Calculates the total profits and costs for a given list of dates and ticker symbols.
 	"""
-	def __init__(self):
+	def __init__(self, capacity: int = 1024):
 		"""
 		Initializes a TradeHistory instance with empty buy and sell histories.
+
+		Args:
+			capacity: An integer representing the initial number of orders the logs can hold before growing.
 		"""
-		self.buy_history = {}
-		self.sell_history = {}
+		self.n_buys = 0
+		self.buy_date_id = np.zeros(capacity, dtype=np.intp)
+		self.buy_ticker_id = np.zeros(capacity, dtype=np.intp)
+		self.buy_price = np.zeros(capacity)
+		self.buy_qty = np.zeros(capacity, dtype=np.int64)
+
+		self.n_sells = 0
+		self.sells_sorted = True
+		self.cum_profits, self.cum_costs = None, None
+		self.sell_date_id = np.zeros(capacity, dtype=np.intp)
+		self.sell_ticker_id = np.zeros(capacity, dtype=np.intp)
+		self.sell_price = np.zeros(capacity)
+		self.sell_qty = np.zeros(capacity, dtype=np.int64)
+		self.sell_profit = np.zeros(capacity)
+		self.sell_cost = np.zeros(capacity)
 
 	def add_buy(self, year: int, month: int, day: int, buy: Buy) -> None:
 		"""
@@ -144,7 +179,27 @@ class TradeHistory():
 			day: An integer representing the day.
 			buy: A Buy instance representing the buy order.
 		"""
-		self.buy_history.setdefault(year, {}).setdefault(month, {}).setdefault(day, {}).setdefault(buy.ticker, buy)
+		self.add_buys([DATE_IDX[(year, month, day)]], [TICKER_IDX[buy.ticker]], [buy.price], [buy.qty])
+
+	def add_buys(self, date_ids: np.ndarray, ticker_ids: np.ndarray, prices: np.ndarray, qtys: np.ndarray) -> None:
+		"""
+		Adds many buy orders to the history at once.
+
+		Args:
+			date_ids: An array of integers representing the row in PRICES of the date of each buy order.
+			ticker_ids: An array of integers representing the column in PRICES of the ticker of each buy order.
+			prices: An array of floats representing the price per share of each buy order.
+			qtys: An array of integers representing the quantity of shares of each buy order.
+		"""
+		i, j = self.n_buys, self.n_buys + len(date_ids)
+		while j > len(self.buy_date_id):
+			self.buy_date_id, self.buy_ticker_id, self.buy_price, self.buy_qty = double_capacity(
+				self.buy_date_id, self.buy_ticker_id, self.buy_price, self.buy_qty)
+		self.buy_date_id[i:j] = date_ids
+		self.buy_ticker_id[i:j] = ticker_ids
+		self.buy_price[i:j] = prices
+		self.buy_qty[i:j] = qtys
+		self.n_buys = j
 
 	def add_sell(self, year: int, month: int, day: int, sell: Sell) -> None:
 		"""
@@ -156,7 +211,40 @@ class TradeHistory():
 			day: An integer representing the day.
 			sell: A Sell instance representing the sell order.
 		"""
-		self.sell_history.setdefault(year, {}).setdefault(month, {}).setdefault(day, {}).setdefault(sell.ticker, sell)
+		self.add_sells(
+			[DATE_IDX[(year, month, day)]], [TICKER_IDX[sell.ticker]],
+			[sell.price], [sell.qty], [sell.profit], [sell.cost])
+
+	def add_sells(
+			self, date_ids: np.ndarray, ticker_ids: np.ndarray, prices: np.ndarray,
+			qtys: np.ndarray, profits: np.ndarray, costs: np.ndarray) -> None:
+		"""
+		Adds many sell orders to the history at once.
+
+		Args:
+			date_ids: An array of integers representing the row in PRICES of the date of each sell order.
+			ticker_ids: An array of integers representing the column in PRICES of the ticker of each sell order.
+			prices: An array of floats representing the price per share of each sell order.
+			qtys: An array of integers representing the quantity of shares of each sell order.
+			profits: An array of floats representing the profit made from each sell order.
+			costs: An array of floats representing the cost of the shares of each sell order.
+		"""
+		i, j = self.n_sells, self.n_sells + len(date_ids)
+		while j > len(self.sell_date_id):
+			self.sell_date_id, self.sell_ticker_id, self.sell_price, self.sell_qty, self.sell_profit, self.sell_cost = \
+				double_capacity(
+					self.sell_date_id, self.sell_ticker_id, self.sell_price,
+					self.sell_qty, self.sell_profit, self.sell_cost)
+		self.sell_date_id[i:j] = date_ids
+		self.sell_ticker_id[i:j] = ticker_ids
+		self.sell_price[i:j] = prices
+		self.sell_qty[i:j] = qtys
+		self.sell_profit[i:j] = profits
+		self.sell_cost[i:j] = costs
+		if np.any(np.diff(self.sell_date_id[max(i - 1, 0):j]) < 0):
+			self.sells_sorted = False
+		self.n_sells = j
+		self.cum_profits, self.cum_costs = None, None
 
 	def get_buy(self, year: int, month: int, day: int, ticker: str) -> Buy:
 		"""
@@ -172,9 +260,15 @@ class TradeHistory():
 			A Buy instance representing the buy order, or None if no such order exists.
 		"""
 		try: 
-			return self.buy_history[year][month][day][ticker]
+			date_id, ticker_id = DATE_IDX[(year, month, day)], TICKER_IDX[ticker]
 		except KeyError:
 			return None
+		n = self.n_buys
+		matches = np.flatnonzero((self.buy_date_id[:n] == date_id) & (self.buy_ticker_id[:n] == ticker_id))
+		if len(matches) == 0:
+			return None
+		i = matches[0]
+		return Buy(ticker, float(self.buy_price[i]), int(self.buy_qty[i]))
 
 	def get_sell(self, year: int, month: int, day: int, ticker: str) -> Sell:
 		"""
@@ -191,88 +285,115 @@ class TradeHistory():
 			A Sell instance representing the sell order, or None if no such order exists.
 		"""
 		try: 
-			return self.sell_history[year][month][day][ticker]
+			date_id, ticker_id = DATE_IDX[(year, month, day)], TICKER_IDX[ticker]
 		except KeyError:
 			return None
+		n = self.n_sells
+		matches = np.flatnonzero((self.sell_date_id[:n] == date_id) & (self.sell_ticker_id[:n] == ticker_id))
+		if len(matches) == 0:
+			return None
+		i = matches[0]
+		return Sell(
+			ticker, float(self.sell_price[i]), int(self.sell_qty[i]),
+			float(self.sell_profit[i]), float(self.sell_cost[i]))
 			
-	def sum_profits_costs(self, dates: [(int, int, int)], tickers: [str] = all_tickers) -> (float, float):
+	def sort_by_date(self) -> None:
 		"""
-		Calculates the total profits and costs for a given list of dates and ticker symbols.
-		This method takes a list of dates and a list of ticker symbols, and calculates the total profits and costs from all sell orders on those dates for those ticker symbols.
-
-		Args:
-			dates: A list of tuples, where each tuple contains three integers representing a year, month, and day.
-			tickers: A list of strings representing ticker symbols. Defaults to all ticker symbols.
-
-		Returns:
-			A tuple containing two floats. The first float is the total profits, and the second float is the total costs.
+		Sorts the sell log by date, keeping the order of the sell orders within a date.
+		This method does nothing if the sell orders were already added in chronological order.
 		"""
-		profits = 0
-		costs = 0
-		for year, month, day in dates:
-			for ticker in tickers:
-				sell = self.get_sell(year, month, day, ticker)
-				if sell is not None:
-					profits += sell.profit
-					costs += sell.cost
-		return profits, costs
-
-class Asset():
-	"""
-	Represents the holdings of an asset.
-	This class holds the details of an asset, including the quantity of shares owned, the cost of the shares,
-	the current value of the shares, and the cash made from the shares.
-
-	Attributes:
-		qty: An integer representing the quantity of shares owned.
-		cost: A float representing the cost of the shares.
-		value: A float representing the current value of the shares.
-		cash: A float representing the cash made from the shares (realized profit). 
-
-	Properties:
-		avg_price: Returns the average price per share.
-		profit: Returns the unrealized profits from the shares.
-	"""
-	def __init__(self):
+		if self.sells_sorted:
+			return
+		n = self.n_sells
+		order = np.argsort(self.sell_date_id[:n], kind='stable')
+		for log in (
+				self.sell_date_id, self.sell_ticker_id, self.sell_price,
+				self.sell_qty, self.sell_profit, self.sell_cost):
+			log[:n] = log[:n][order]
+		self.sells_sorted = True
+		self.cum_profits, self.cum_costs = None, None
+
+	def cumulative_profits_costs(self) -> (np.ndarray, np.ndarray):
 		"""
-		Initializes a Ticker instance with zero quantity, cost, value, and cash.
+		Returns the running totals of the profits and costs of the date-sorted sell log, per ticker.
+		Row i holds the totals of the first i sell orders, so the totals of the sell orders lo to hi-1 are row hi minus row lo.
+		The running totals are computed once and cached until the next sell order is added.
+
+		Returns:
+			A tuple containing two matrices of floats with n_sells + 1 rows and one column per ticker.
+			The first matrix holds the running profits, and the second matrix holds the running costs.
 		"""
-		self.qty = 0 # How many shares of this ticker are owned
-		self.cost = 0 # How much cash was spent on this ticker
-		self.value = 0 # How much the ticker is worth right now
-		self.cash = 0 # How much cash was made from this ticker, all buys and sells
-	
-	@property
-	def avg_price(self):
+		if self.cum_profits is None:
+			self.sort_by_date()
+			n = self.n_sells
+			rows, columns = np.arange(1, n + 1), self.sell_ticker_id[:n]
+			self.cum_profits = np.zeros((n + 1, len(all_tickers)))
+			self.cum_profits[rows, columns] = self.sell_profit[:n]
+			np.cumsum(self.cum_profits, axis=0, out=self.cum_profits)
+			self.cum_costs = np.zeros((n + 1, len(all_tickers)))
+			self.cum_costs[rows, columns] = self.sell_cost[:n]
+			np.cumsum(self.cum_costs, axis=0, out=self.cum_costs)
+		return self.cum_profits, self.cum_costs
+
+	def profits_costs_by_date(self, tickers: [str] = all_tickers) -> (np.ndarray, np.ndarray):
 		"""
-		Returns the average price per share.
+		Calculates the total profits and costs of the sell orders on each date for the given ticker symbols.
 
-		This property calculates the average price per share by dividing the cost by the quantity.
-		If the quantity is zero, it returns zero.
+		Args:
+			tickers: A list of strings representing ticker symbols. Defaults to all ticker symbols.
 
 		Returns:
-			A float representing the average price per share.
+			A tuple containing two arrays of floats with one entry for every date in PRICES.
+			The first array holds the total profits, and the second array holds the total costs.
 		"""
-		return self.cost / self.qty if self.qty != 0 else 0
-	
-	@property
-	def profit(self):
+		n = self.n_sells
+		mask = np.isin(self.sell_ticker_id[:n], get_ticker_ids(tickers))
+		date_ids = self.sell_date_id[:n][mask]
+		return np.bincount(date_ids, weights=self.sell_profit[:n][mask], minlength=len(DATE_IDX)), \
+			np.bincount(date_ids, weights=self.sell_cost[:n][mask], minlength=len(DATE_IDX))
+
+	def sum_profits_costs(self, dates: [(int, int, int)], tickers: [str] = all_tickers) -> (float, float):
 		"""
-		Returns the profit made from the shares.
-		This property calculates the profit by subtracting the cost from the value.
+		Calculates the total profits and costs for a given list of dates and ticker symbols.
+		This method takes a list of dates and a list of ticker symbols, and calculates the total profits and costs from all sell orders on those dates for those ticker symbols.
+		The sell log is sorted by date, so the sell orders between the first and the last date are found with two binary searches,
+				and their totals are the difference of two rows of the running totals.
+		Only if the dates skip a date in PRICES, the sell orders in between are filtered with a mask.
+
+		Args:
+			dates: A list of tuples, where each tuple contains three integers representing a year, month, and day.
+			tickers: A list of strings representing ticker symbols. Defaults to all ticker symbols.
 
 		Returns:
-			A float representing the profit made from the shares.
+			A tuple containing two floats. The first float is the total profits, and the second float is the total costs.
 		"""
-		return self.value - self.cost
+		date_ids = [DATE_IDX[date] for date in dates if date in DATE_IDX]
+		if not date_ids:
+			return 0.0, 0.0
+		self.sort_by_date()
+		sell_date_id = self.sell_date_id[:self.n_sells]
+		first_date_id, last_date_id = min(date_ids), max(date_ids)
+		lo = np.searchsorted(sell_date_id, first_date_id, 'left')
+		hi = np.searchsorted(sell_date_id, last_date_id, 'right')
+		if len(date_ids) == last_date_id - first_date_id + 1:
+			cum_profits, cum_costs = self.cumulative_profits_costs()
+			return float(take_tickers(cum_profits[hi] - cum_profits[lo], tickers).sum()), \
+				float(take_tickers(cum_costs[hi] - cum_costs[lo], tickers).sum())
+		mask = np.isin(self.sell_ticker_id[lo:hi], get_ticker_ids(tickers)) & np.isin(sell_date_id[lo:hi], date_ids)
+		return float(self.sell_profit[lo:hi][mask].sum()), float(self.sell_cost[lo:hi][mask].sum())
 
 class Inventory():
 	"""
 	Represents an inventory of assets.
-	This class holds a dictionary of assets, where the keys are ticker symbols and the values are Asset instances.
+	This class holds the holdings of every ticker in parallel arrays,
+			where the position of a ticker in each array is its column in PRICES.
 
 	Attributes:
-		assets: A dictionary where the keys are strings representing ticker symbols and the values are Asset instances.
+		qty_arr: An array of integers representing the quantity of shares owned of each ticker.
+		cost_arr: An array of floats representing the cost of the shares of each ticker.
+		value_arr: An array of floats representing the current value of the shares of each ticker.
+		cash_arr: An array of floats representing the cash made from each ticker (realized profit).
+		dirty: A boolean representing whether the quantity, cost, or cash changed since the last snapshot.
 
 	Methods:
 		value: Returns the total value of the specified assets.
@@ -280,13 +401,24 @@ class Inventory():
 		costs: Returns the total cost of the specified assets.
 		cash: Returns the total cash of the specified assets.
 	"""
-	def __init__(self, tickers_interested: [str] = all_tickers):
+	def __init__(
+			self, tickers_interested: [str] = all_tickers,
+			qty_arr: np.ndarray = None, cost_arr: np.ndarray = None,
+			value_arr: np.ndarray = None, cash_arr: np.ndarray = None):
 		"""
-		Initializes an Inventory instance with a dictionary of assets.
+		Initializes an Inventory instance with zero quantity, cost, value, and cash for every ticker.
+		If the arrays are given, the Inventory instance uses them instead, e.g. to be a view on a snapshot.
 		"""
-		self.assets = {
-			ticker: Asset() for ticker in all_tickers
-		}
+		n_tickers = len(all_tickers)
+		# How many shares of each ticker are owned
+		self.qty_arr = np.zeros(n_tickers, dtype=np.int64) if qty_arr is None else qty_arr
+		# How much cash was spent on each ticker
+		self.cost_arr = np.zeros(n_tickers) if cost_arr is None else cost_arr
+		# How much each ticker is worth right now
+		self.value_arr = np.zeros(n_tickers) if value_arr is None else value_arr
+		# How much cash was made from each ticker, all buys and sells
+		self.cash_arr = np.zeros(n_tickers) if cash_arr is None else cash_arr
+		self.dirty = True
 
 	def value(self, tickers: [str] = all_tickers) -> float:
 		"""
@@ -299,13 +431,14 @@ class Inventory():
 		Returns:
 			A float representing the total value of the specified assets.
 		"""
-		return sum([self.assets[ticker].value for ticker in tickers])
+		return float(take_tickers(self.value_arr, tickers).sum())
 	
 	def profits(self, tickers: [str] = all_tickers) -> float:
 		"""
 		Returns the total profit of the specified assets.
 
 		This method takes a list of ticker symbols and returns the sum of the profits of the corresponding assets.
+		The profit of an asset is its value minus its cost.
 
 		Args:
 			tickers: A list of strings representing ticker symbols. Defaults to all ticker symbols.
@@ -313,7 +446,7 @@ class Inventory():
 		Returns:
 			A float representing the total profit of the specified assets.
 		"""
-		return sum([self.assets[ticker].profit for ticker in tickers])
+		return float((take_tickers(self.value_arr, tickers) - take_tickers(self.cost_arr, tickers)).sum())
 	
 	def costs(self, tickers: [str] = all_tickers) -> float:
 		"""
@@ -326,7 +459,7 @@ class Inventory():
 		Returns:
 			A float representing the total cost of the specified assets.
 		"""
-		return sum([self.assets[ticker].cost for ticker in tickers])
+		return float(take_tickers(self.cost_arr, tickers).sum())
 	
 	def cash(self, tickers: [str] = all_tickers) -> float:
 		"""
@@ -339,26 +472,92 @@ class Inventory():
 		Returns:
 			A float representing the total cash of the specified assets.
 		"""
-		return sum([self.assets[ticker].cash for ticker in tickers])
+		return float(take_tickers(self.cash_arr, tickers).sum())
 
 class InventorySnapshot():
 	"""
-	Represents a snapshot of an inventory.
-	This class holds a dictionary of inventory snapshots, where the keys are dates and the values are Inventory instances.
+	Represents the daily snapshots of an inventory.
+	This class holds the holdings of every snapshot in matrices, where the columns are the tickers.
+	The values change every day, so value_snap has one row for every date in PRICES.
+	The quantities, costs, and cash only change on days with trades, so a snapshot of an inventory
+			which did not change since the previous snapshot shares the holdings row of the previous snapshot.
+	A snapshot is found through DATE_IDX, which maps a date to its row, and the taken flag of that row.
 
 	Attributes:
-		snapshot: A dictionary where the keys are tuples representing dates and the values are Inventory instances.
+		qty_snap: A matrix of integers representing the quantity of shares owned of each ticker in each holdings row.
+		cost_snap: A matrix of floats representing the cost of the shares of each ticker in each holdings row.
+		cash_snap: A matrix of floats representing the cash made from each ticker in each holdings row.
+		n_holdings: An integer representing the number of holdings rows in use, the matrices grow when they are full.
+		holdings_row: An array of integers representing the holdings row of each date.
+		value_snap: A matrix of floats representing the value of the shares of each ticker on each date.
+		taken: An array of booleans representing whether a snapshot was taken on each date.
+		sorted_keys: A cache of the keys property, None if it has to be recomputed.
+
+	Properties:
+		keys: Returns the dates of all snapshots packed by pack_date, sorted ascending.
 
 	Methods:
+		reserve: Makes room for the specified number of new holdings rows.
 		get: Returns the Inventory instance for the specified date.
 		take_snapshot: Takes a snapshot of the specified Inventory instance and stores it with the specified date.
+		mark_taken: Registers snapshots whose rows were written into the matrices directly.
 		get_closest_inventory: Returns the Inventory instance for the closest available date to the specified date.
 	"""
-	def __init__(self):
+	def __init__(self, capacity: int = 64):
 		"""
-		Initializes an InventorySnapshot instance with an empty dictionary of snapshots.
+		Initializes an InventorySnapshot instance without snapshots.
+
+		Args:
+			capacity: An integer representing the initial number of holdings rows.
+		"""
+		n_dates, n_tickers = len(DATE_IDX), len(all_tickers)
+		self.qty_snap = np.zeros((capacity, n_tickers), dtype=np.int64)
+		self.cost_snap = np.zeros((capacity, n_tickers))
+		self.cash_snap = np.zeros((capacity, n_tickers))
+		self.n_holdings = 0
+		self.holdings_row = np.zeros(n_dates, dtype=np.intp)
+		self.value_snap = np.zeros((n_dates, n_tickers))
+		self.taken = np.zeros(n_dates, dtype=bool)
+		self.sorted_keys = None
+
+	@property
+	def keys(self) -> np.ndarray:
+		"""
+		Returns the dates of all snapshots packed by pack_date, sorted ascending.
+		The array is cached until the next snapshot of a new date is taken.
+
+		Returns:
+			An array of integers representing the dates of all snapshots in the format YYYYMMDD.
+		"""
+		if self.sorted_keys is None:
+			self.sorted_keys = np.sort(DATE_KEYS[self.taken])
+		return self.sorted_keys
+
+	def reserve(self, n: int) -> None:
+		"""
+		Makes room for the specified number of new holdings rows.
+
+		Args:
+			n: An integer representing the number of holdings rows which will be added.
+		"""
+		while self.n_holdings + n > len(self.qty_snap):
+			self.qty_snap, self.cost_snap, self.cash_snap = double_capacity(self.qty_snap, self.cost_snap, self.cash_snap)
+
+	def inventory_at(self, date_id: int) -> Inventory:
+		"""
+		Returns the Inventory instance of the snapshot of the specified date.
+		The returned Inventory is a view on the rows of the snapshot, no holdings are copied.
+
+		Args:
+			date_id: An integer representing the row of the date in PRICES.
+
+		Returns:
+			An Inventory instance for the specified date.
 		"""
-		self.snapshot = {}
+		row = self.holdings_row[date_id]
+		return Inventory(
+			qty_arr=self.qty_snap[row], cost_arr=self.cost_snap[row],
+			value_arr=self.value_snap[date_id], cash_arr=self.cash_snap[row])
 
 	def get(self, year: int, month: int, day: int) -> Inventory:
 		"""
@@ -374,16 +573,21 @@ class InventorySnapshot():
 		Returns:
 			An Inventory instance for the specified date, or None if no such instance exists.
 		"""
-		try:
-			return self.snapshot[year][month][day]
-		except KeyError:
+		date_id = DATE_IDX.get((year, month, day))
+		if date_id is None or not self.taken[date_id]:
 			return None
+		return self.inventory_at(date_id)
 
 	def take_snapshot(self, year: int, month: int, day: int, inventory: Inventory):
 		"""
 		Takes a snapshot of the specified Inventory instance and stores it with the specified date.
 		This method takes a year, month, day, and Inventory instance,
-				and stores the Inventory instance in the snapshot with the specified date.
+				and copies the holdings of the Inventory instance into the snapshot of the specified date.
+		The value of each ticker is the end-of-day price times the quantity, which is written straight into the row
+				of the specified date, and the value array of the Inventory instance becomes a view on that row.
+		The quantities, costs, and cash are only copied into a new holdings row if the Inventory instance is dirty,
+				otherwise the snapshot shares the holdings row of the previous snapshot.
+		Snapshots are expected to be taken of a single Inventory instance in chronological order.
 
 		Args:
 			year: An integer representing the year.
@@ -391,8 +595,33 @@ class InventorySnapshot():
 			day: An integer representing the day.
 			inventory: An Inventory instance to be stored in the snapshot.
 		"""
-		self.snapshot.setdefault(year, {}).setdefault(month, {}).setdefault(day, copy.deepcopy(inventory))
+		date_id = DATE_IDX[(year, month, day)]
+		if inventory.dirty or self.n_holdings == 0:
+			self.reserve(1)
+			row = self.n_holdings
+			self.qty_snap[row] = inventory.qty_arr
+			self.cost_snap[row] = inventory.cost_arr
+			self.cash_snap[row] = inventory.cash_arr
+			self.n_holdings += 1
+			inventory.dirty = False
+		self.holdings_row[date_id] = self.n_holdings - 1
+		np.multiply(PRICES[date_id], inventory.qty_arr, out=self.value_snap[date_id], dtype=np.float64)
+		inventory.value_arr = self.value_snap[date_id]
+		if not self.taken[date_id]:
+			self.taken[date_id] = True
+			self.sorted_keys = None
+		clear_return_caches()
 	
+	def mark_taken(self, date_ids: np.ndarray) -> None:
+		"""
+		Registers snapshots whose rows were written into the matrices directly, e.g. by replay_kernel.
+
+		Args:
+			date_ids: An array of integers representing the rows in PRICES of the dates of the snapshots.
+		"""
+		self.taken[date_ids] = True
+		self.sorted_keys = None
+
 	def get_closest_inventory(self, year: int, month: int, day: int) -> Inventory:
 		"""
 		Returns the Inventory instance for the closest available date to the specified date.
@@ -407,11 +636,7 @@ class InventorySnapshot():
 		Returns:
 			An Inventory instance for the closest available date to the specified date.
 		"""
-		year, month, day = get_closest_available_date(year, month, day, self.snapshot)
-		try:
-			return self.snapshot[year][month][day]
-		except KeyError:
-			return None
+		return self.inventory_at(DATE_IDX[get_closest_available_date(year, month, day, self.keys)])
 
 # Date utilities
 def get_date(first_cell: str) -> (int, int, int):
@@ -433,60 +658,83 @@ def get_date(first_cell: str) -> (int, int, int):
 	year, month, day = first_cell.split('-')
 	return int(year), int(month), int(day)
 
-def get_first_month_day(d: dict) -> (int, int):
+def pack_date(year: int, month: int, day: int) -> int:
+	"""
+	Packs a date into a single integer which sorts like the date.
+
+	Args:
+		year: An integer representing the year.
+		month: An integer representing the month.
+		day: An integer representing the day.
+
+	Returns:
+		An integer representing the date in the format YYYYMMDD. For example:
+		2020, 1, 2 -> 20200102
+	"""
+	return year * 10000 + month * 100 + day
+
+def unpack_date(key: int) -> (int, int, int):
 	"""
-	Returns the first day of the first month in the dictionary.
-	This function takes a nested dictionary in the format {month: {day: {ticker: price}}},
-			and returns the first day of the first month.
+	Unpacks a date packed by pack_date into year, month, and day.
 
 	Args:
-		d: A nested dictionary where the first level keys are months, the second level keys are days,
-				and the values are dictionaries mapping tickers to prices.
+		key: An integer representing a date in the format YYYYMMDD.
 
 	Returns:
-		A tuple of two integers representing the first month and the first day in the dictionary, respectively. For example:
-		{1: {2: {'AAPL': 150}}} -> (1, 2)
+		A tuple of three integers representing the year, month, and day, respectively. For example:
+		20200102 -> (2020, 1, 2)
+	"""
+	key = int(key)
+	return key // 10000, key // 100 % 100, key % 100
+
+def get_closest_available_date(year: int, month: int, day: int, keys: np.ndarray) -> (int, int, int):
+	"""
+	Returns the closest available date in the keys which is less than or equal to the given date.
+		This function takes a year, month, and day, and a sorted array of dates packed by pack_date.
+		It finds the closest date in the array that is less than or equal to the given date with a binary search.
+
+	Args:
+		year: An integer representing the year.
+		month: An integer representing the month.
+		day: An integer representing the day.
+		keys: An array of integers representing the available dates in the format YYYYMMDD, sorted ascending.
+
+	Returns:
+		A tuple of three integers representing the closest year, month, and day in the keys that is less than
+				or equal to the given date. For example:
+		2020, 2, 4, array([20200102]) -> (2020, 1, 2)
 
 	Raises:
-		ValueError: If the input dictionary is empty, a ValueError will be raised when trying to find the minimum key.
+		ValueError: If there is no available date less than or equal to the given date.
 	"""
-	return min(d.keys()), min(d[min(d.keys())].keys())
+	i = np.searchsorted(keys, pack_date(year, month, day), 'right') - 1
+	if i < 0:
+		raise ValueError(f'No available date on or before {year}-{month}-{day}')
+	return unpack_date(keys[i])
 
-def get_closest_available_date(year: int, month: int, day: int, d: dict) -> (int, int, int):
+def get_first_available_date(year: int, month: int, day: int, keys: np.ndarray) -> (int, int, int):
 	"""
-	Returns the closest available date in the dictionary which is less than or equal to the given date.
-		This function takes a year, month, and day, and a nested dictionary in the format {year: {month: {day: {ticker: price}}}}.
-		It finds the closest date in the dictionary that is less than or equal to the given date.
+	Returns the closest available date in the keys which is greater than or equal to the given date.
+		This is the counterpart of get_closest_available_date.
 
 	Args:
 		year: An integer representing the year.
 		month: An integer representing the month.
 		day: An integer representing the day.
-		d: A nested dictionary where the first level keys are years, the second level keys are months,
-				the third level keys are days, and the values are dictionaries mapping tickers to prices.
+		keys: An array of integers representing the available dates in the format YYYYMMDD, sorted ascending.
 
 	Returns:
-		A tuple of three integers representing the closest year, month, and day in the dictionary that is less than
+		A tuple of three integers representing the closest year, month, and day in the keys that is greater than
 				or equal to the given date. For example:
-		2020, 2, 4, {2020: {1: {2: {'AAPL': 150}}}} -> (2020, 1, 2)
+		2020, 1, 1, array([20200102]) -> (2020, 1, 2)
 
 	Raises:
-		ValueError: If the input dictionary is empty, a ValueError will be raised when trying to find the maximum key.
-	"""
-	year = max(key for key in map(int, d.keys()) if key <= year)
-	try:
-		month = max(key for key in map(int, d[year].keys()) if key <= month)
-	except Exception:
-		year = max(key for key in map(int, d.keys()) if key <= year)
-		year = year - 1
-		month = max(key for key in map(int, d[year].keys()) if key <= 12)
-	try:
-		day = max(key for key in map(int, d[year][month].keys()) if key <= day)
-	except Exception:
-		month = max(key for key in map(int, d[year].keys()) if key <= month)
-		month = month - 1
-		day = max(key for key in map(int, d[year][month].keys()) if key <= monthrange(year, month)[1])
-	return year, month, day
+		ValueError: If there is no available date greater than or equal to the given date.
+	"""
+	i = np.searchsorted(keys, pack_date(year, month, day), 'left')
+	if i == len(keys):
+		raise ValueError(f'No available date on or after {year}-{month}-{day}')
+	return unpack_date(keys[i])
 
 def get_all_dates(
 		year_start: int, month_start: int, day_start: int,
@@ -509,43 +757,104 @@ def get_all_dates(
 		2020, 1, 1, 2020, 1, 3 -> [(2020, 1, 1), (2020, 1, 2), (2020, 1, 3)]
 
 	Raises:
-		ValueError: If the start date is later than the end date,
-				a ValueError will be raised when trying to append dates to the list.
-	"""
-	date_start = datetime(year_start, month_start, day_start)
-	date_end = datetime(year_end, month_end, day_end)
-	dates = []
-	while date_start <= date_end:
-		dates.append((date_start.year, date_start.month, date_start.day))
-		date_start += relativedelta(days=1)
-	return dates
-
-def get_all_dates_year(year: int, d: dict) -> [(int, int, int)]:
-	"""
-	Returns a list of all dates in the given year that are present in the dictionary.
-	This function takes a year and a nested dictionary in the format {year: {month: {day: {ticker: price}}}}. 
-	It finds the first and last available dates in the given year in the dictionary,
+		ValueError: If the start or end date is not a valid date.
+				If the start date is later than the end date, an empty list is returned.
+	"""
+	dates = np.arange(
+		np.datetime64(dt.date(year_start, month_start, day_start)),
+		np.datetime64(dt.date(year_end, month_end, day_end)) + 1)
+	# Split the whole range into its components at once instead of stepping through it day by day
+	years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+	months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+	days = (dates - dates.astype('datetime64[M]')).astype(np.int64) + 1
+	return list(zip(years.tolist(), months.tolist(), days.tolist()))
+
+def get_all_dates_year(year: int, keys: np.ndarray) -> [(int, int, int)]:
+	"""
+	Returns a list of all dates in the given year that are present in the keys.
+	This function takes a year and a sorted array of dates packed by pack_date. 
+	It finds the first and last available dates in the given year in the keys,
 			and returns a list of all dates in between.
 
 	Args:
 		year: An integer representing the year.
-		d: A nested dictionary where the first level keys are years, the second level keys are months,
-				the third level keys are days, and the values are dictionaries mapping tickers to prices.
+		keys: An array of integers representing the available dates in the format YYYYMMDD, sorted ascending.
 
 	Returns:
 		A list of tuples, where each tuple contains three integers representing a year, month, and day. For example:
-		2020, {2020: {1: {2: {'AAPL': 150}}}} -> [(2020, 1, 2), ..., (2020, 12, 31)]
+		2020, array([20200102, 20201231]) -> [(2020, 1, 2), ..., (2020, 12, 31)]
 
 	Raises:
-		KeyError: If the given year is not in the dictionary, a KeyError will be raised when trying to access d[year].
-		ValueError: If there are no dates in the given year in the dictionary,
-				a ValueError will be raised when trying to find the first and last available dates.
+		ValueError: If there is no available date on or after the start or on or before the end of the given year.
 	"""
-	month_start, day_start = get_first_month_day(d[year])
-	year_end, month_end, day_end = get_closest_available_date(year, 12, 31, d)
-	return get_all_dates(year, month_start, day_start, year_end, month_end, day_end)
+	year_start, month_start, day_start = get_first_available_date(year, 1, 1, keys)
+	year_end, month_end, day_end = get_closest_available_date(year, 12, 31, keys)
+	return get_all_dates(year_start, month_start, day_start, year_end, month_end, day_end)
 
 # Data processing
+def double_capacity(*arrays: np.ndarray) -> (np.ndarray, ...):
+	"""
+	Returns copies of the specified arrays with twice their length.
+	This function is used to grow append-only logs, the new entries are zero.
+
+	Args:
+		arrays: The arrays to grow.
+
+	Returns:
+		A tuple of arrays, where each array starts with the values of the corresponding specified array. For example:
+		array([1, 2]) -> (array([1, 2, 0, 0]),)
+	"""
+	return tuple(np.concatenate([array, np.zeros_like(array)]) for array in arrays)
+
+def get_ticker_ids(tickers: [str]) -> np.ndarray:
+	"""
+	Returns the columns of the specified tickers in PRICES.
+	This function takes a list of ticker symbols and translates each of them with TICKER_IDX,
+			so that the arrays of an Inventory can be indexed with the result.
+	The translation is cached, see get_ticker_ids_of.
+
+	Args:
+		tickers: A list of strings representing ticker symbols.
+
+	Returns:
+		A read-only array of integers representing the column of each ticker in PRICES. For example:
+		['XLU', 'XLE'] -> array([1, 0])
+	"""
+	return get_ticker_ids_of(tuple(tickers))
+
+@functools.lru_cache(maxsize=64)
+def get_ticker_ids_of(tickers: (str, ...)) -> np.ndarray:
+	"""
+	Returns the columns of the specified tickers in PRICES, cached by the tuple of tickers.
+	The same lists of tickers are requested for every row of the profit table, so they are only translated once.
+	The returned array is shared between the callers and therefore read-only.
+
+	Args:
+		tickers: A tuple of strings representing ticker symbols.
+
+	Returns:
+		A read-only array of integers representing the column of each ticker in PRICES.
+	"""
+	ticker_ids = np.fromiter((TICKER_IDX[ticker] for ticker in tickers), dtype=np.intp, count=len(tickers))
+	ticker_ids.flags.writeable = False
+	return ticker_ids
+
+def take_tickers(arr: np.ndarray, tickers: [str]) -> np.ndarray:
+	"""
+	Returns the entries of the specified tickers from an array whose last axis follows the columns of PRICES.
+	If the tickers are all tickers in the order of PRICES, the array itself is returned instead of a copy.
+
+	Args:
+		arr: An array whose last axis has one entry per ticker, e.g. Inventory.value_arr or InventorySnapshot.value_snap.
+		tickers: A list of strings representing ticker symbols.
+
+	Returns:
+		An array with the entries of the specified tickers along the last axis.
+	"""
+	if tickers == all_tickers:
+		return arr
+	return arr[..., get_ticker_ids(tickers)]
+
 def get_daily_price(year: int, month: int, day: int, ticker: str) -> float:
 	"""
 	Returns the end-of-day price of the specified ETF on the specified date.
@@ -561,7 +870,7 @@ def get_daily_price(year: int, month: int, day: int, ticker: str) -> float:
 	Returns:
 		A float representing the end-of-day price of the specified ETF on the specified date.
 	"""
-	return price_daily[year][month][day][ticker]
+	return float(PRICES[DATE_IDX[(year, month, day)], TICKER_IDX[ticker]])
 
 def process_trade(year: str, month: str, day: str, ticker: str, qty: int, order_type: str) -> None:
 	"""
@@ -582,24 +891,29 @@ def process_trade(year: str, month: str, day: str, ticker: str, qty: int, order_
 		None
 	"""
 	eod_price = get_daily_price(year, month, day, ticker)
-	curr_ticker = inventory_curr.assets[ticker]
+	ticker_id = TICKER_IDX[ticker]
+	inventory_curr.dirty = True
+	clear_return_caches()
 	if order_type == BUY:
 		trades.add_buy(year, month, day, Buy(ticker, eod_price, qty))
-		curr_ticker.qty += qty
-		curr_ticker.cost += eod_price * qty
-		curr_ticker.cash -= (eod_price * qty)
+		inventory_curr.qty_arr[ticker_id] += qty
+		inventory_curr.cost_arr[ticker_id] += eod_price * qty
+		inventory_curr.cash_arr[ticker_id] -= (eod_price * qty)
 	else:
-		temp_avg_price = curr_ticker.avg_price
-		trades.add_sell(
-			year, month, day, Sell(ticker, eod_price, qty, (eod_price - temp_avg_price) * qty, temp_avg_price * qty))
-		curr_ticker.cash += (eod_price * qty)
-		curr_ticker.cost -= temp_avg_price * qty
-		curr_ticker.qty -= qty
+		# The sold shares take their share of the cost with them, i.e. they are valued at the average price
+		curr_qty = inventory_curr.qty_arr[ticker_id]
+		cost_removed = inventory_curr.cost_arr[ticker_id] * (qty / curr_qty) if curr_qty != 0 else 0.0
+		proceeds = eod_price * qty
+		trades.add_sell(year, month, day, Sell(ticker, eod_price, qty, proceeds - cost_removed, cost_removed))
+		inventory_curr.cash_arr[ticker_id] += proceeds
+		inventory_curr.cost_arr[ticker_id] -= cost_removed
+		inventory_curr.qty_arr[ticker_id] -= qty
 
-def calc_unrealized_profits(year: int, month: int, day: int) -> None:
+def daily_update(year: int, month: int, day: int) -> None:
 	"""
-	Updates the unrealized profits of the inventory.
-	This function takes a year, month, and day, and updates the unrealized profits of the inventory for each ETF ticker symbol. The unrealized profit for each ticker is calculated as the end-of-day price times the quantity of the ETF in the current inventory.
+	Performs a daily update of the inventory.
+	This function takes a year, month, and day, and performs a daily update of the inventory.
+	It takes a snapshot of the current inventory, which values the inventory at the end-of-day prices of the date.
 
 	Args:
 		year: An integer representing the year.
@@ -609,55 +923,197 @@ def calc_unrealized_profits(year: int, month: int, day: int) -> None:
 	Returns:
 		None
 	"""
-	for ticker in all_tickers:
-		eod_price = get_daily_price(year, month, day, ticker)
-		curr_ticker = inventory_curr.assets[ticker]
-		curr_ticker.value = eod_price * curr_ticker.qty
+	inventory_snapshot.take_snapshot(year, month, day, inventory_curr)
 
-def daily_update(year: int, month: int, day: int) -> None:
+@numba.njit(cache=True)
+def replay_kernel(
+		date_ids: np.ndarray, ticker_ids: np.ndarray, qtys: np.ndarray, is_buy: np.ndarray, prices: np.ndarray,
+		qty_arr: np.ndarray, cost_arr: np.ndarray, cash_arr: np.ndarray, dirty: bool,
+		qty_snap: np.ndarray, cost_snap: np.ndarray, cash_snap: np.ndarray, n_holdings: int,
+		holdings_row: np.ndarray, value_snap: np.ndarray,
+		trade_prices: np.ndarray, trade_profits: np.ndarray, trade_costs: np.ndarray) -> int:
 	"""
-	Performs a daily update of the inventory.
-	This function takes a year, month, and day, and performs a daily update of the inventory.
-	It first calculates the unrealized profits for the current inventory,
-			and then takes a snapshot of the current inventory.
+	Replays all trades and takes a snapshot of the inventory on every date in PRICES.
+	This is the compiled equivalent of calling process_trade for every trade and daily_update for every date.
+	The trades have to be sorted by date.
 
 	Args:
-		year: An integer representing the year.
-		month: An integer representing the month.
-		day: An integer representing the day.
+		date_ids: An array of integers representing the row in PRICES of the date of each trade.
+		ticker_ids: An array of integers representing the column in PRICES of the ticker of each trade.
+		qtys: An array of integers representing the quantity of each trade.
+		is_buy: An array of booleans representing whether each trade is a buy or a sell.
+		prices: The PRICES matrix.
+		qty_arr, cost_arr, cash_arr: The holdings arrays of the current Inventory, updated in place.
+		dirty: A boolean representing whether the current Inventory changed since its last snapshot.
+		qty_snap, cost_snap, cash_snap: The holdings matrices of the InventorySnapshot,
+				with room for a new holdings row for every date with trades and one more.
+		n_holdings: An integer representing the number of holdings rows already in use.
+		holdings_row, value_snap: The per-date arrays of the InventorySnapshot, filled in place.
+		trade_prices: An array filled with the end-of-day price of each trade.
+		trade_profits: An array filled with the realized profit of each sell, zero for buys.
+		trade_costs: An array filled with the cost of the shares of each sell, zero for buys.
+
+	Returns:
+		An integer representing the number of holdings rows in use after the replay.
+	"""
+	n_trades = len(date_ids)
+	n_dates, n_tickers = prices.shape
+	t = 0
+	for d in range(n_dates):
+		eod_prices = prices[d]
+		while t < n_trades and date_ids[t] == d:
+			k, qty = ticker_ids[t], qtys[t]
+			eod_price = np.float64(eod_prices[k])
+			trade_prices[t] = eod_price
+			if is_buy[t]:
+				qty_arr[k] += qty
+				cost_arr[k] += eod_price * qty
+				cash_arr[k] -= (eod_price * qty)
+			else:
+				cost_removed = cost_arr[k] * (qty / qty_arr[k]) if qty_arr[k] != 0 else 0.0
+				proceeds = eod_price * qty
+				trade_profits[t] = proceeds - cost_removed
+				trade_costs[t] = cost_removed
+				cash_arr[k] += proceeds
+				cost_arr[k] -= cost_removed
+				qty_arr[k] -= qty
+			t += 1
+			dirty = True
+		if dirty or n_holdings == 0:
+			for k in range(n_tickers):
+				qty_snap[n_holdings, k] = qty_arr[k]
+				cost_snap[n_holdings, k] = cost_arr[k]
+				cash_snap[n_holdings, k] = cash_arr[k]
+			n_holdings += 1
+			dirty = False
+		holdings_row[d] = n_holdings - 1
+		value_row = value_snap[d]
+		for k in range(n_tickers):
+			value_row[k] = np.float64(eod_prices[k]) * qty_arr[k]
+	return n_holdings
+
+def replay_trades(dates: [(int, int, int)], tickers: [str], qtys: [int], order_types: [str]) -> None:
+	"""
+	Replays a whole transaction log at once.
+	This function takes the columns of the transaction log, processes every trade on the current inventory,
+			takes a snapshot on every date in PRICES, and records the trades in the trade history.
+	The work is done by replay_kernel.
+
+	Args:
+		dates: A list of tuples, where each tuple represents the date of a trade as (year, month, day).
+		tickers: A list of strings representing the ETF ticker symbol of each trade.
+		qtys: A list of integers representing the quantity of each trade.
+		order_types: A list of strings representing the order type of each trade (either 'BUY' or 'SELL').
 
 	Returns:
 		None
 	"""
-	calc_unrealized_profits(year, month, day)
-	inventory_snapshot.take_snapshot(year, month, day, inventory_curr)
+	date_ids = np.fromiter((DATE_IDX[date] for date in dates), dtype=np.intp, count=len(dates))
+	order = np.argsort(date_ids, kind='stable')
+	date_ids = date_ids[order]
+	ticker_ids = get_ticker_ids(tickers)[order]
+	qtys = np.asarray(qtys, dtype=np.int64)[order]
+	is_buy = (np.asarray(order_types) == BUY)[order]
+
+	trade_prices = np.zeros(len(date_ids))
+	trade_profits = np.zeros(len(date_ids))
+	trade_costs = np.zeros(len(date_ids))
+	inventory_snapshot.reserve(len(np.unique(date_ids)) + 1)
+	inventory_snapshot.n_holdings = replay_kernel(
+		date_ids, ticker_ids, qtys, is_buy, PRICES,
+		inventory_curr.qty_arr, inventory_curr.cost_arr, inventory_curr.cash_arr, inventory_curr.dirty,
+		inventory_snapshot.qty_snap, inventory_snapshot.cost_snap, inventory_snapshot.cash_snap,
+		inventory_snapshot.n_holdings, inventory_snapshot.holdings_row, inventory_snapshot.value_snap,
+		trade_prices, trade_profits, trade_costs)
+	inventory_curr.dirty = False
+	inventory_curr.value_arr = inventory_snapshot.value_snap[-1]
+	inventory_snapshot.mark_taken(np.arange(len(PRICES)))
+
+	is_sell = ~is_buy
+	trades.add_buys(date_ids[is_buy], ticker_ids[is_buy], trade_prices[is_buy], qtys[is_buy])
+	trades.add_sells(
+		date_ids[is_sell], ticker_ids[is_sell], trade_prices[is_sell],
+		qtys[is_sell], trade_profits[is_sell], trade_costs[is_sell])
+	clear_return_caches()
 
 # Utilities
-def get_stock_price_yfinance(
-		year_start: int, month_start: int, day_start:int,
-		year_end: int, month_end: int, day_end: int) -> pd.Series:
-	"""
-	Fetches the stock price for a given ticker and date range using the yfinance library.
-	This function takes a start and end date,
-			and returns a pandas Series of the closing prices for each day in the date range.
-	If the yfinance library fails to fetch the data, it reads the data from a local CSV file.
-	You can access the closing price for a specific date by indexing the Series with a string in the format 'YYYY-MM-DD'.
-	That is .loc['YYYY-MM-DD'].
+def get_market_cache_path(ticker: str, start_date: str, end_date: str) -> str:
+	"""
+	Returns the path of the file the market data of the specified ticker and date range is cached in.
+
 	Args:
-		year_start: An integer representing the start year.
-		month_start: An integer representing the start month.
-		day_start: An integer representing the start day.
-		year_end: An integer representing the end year.
-		month_end: An integer representing the end month.
-		day_end: An integer representing the end day.
+		ticker: A string representing the ticker symbol of the market.
+		start_date: A string representing the start date in the format 'YYYY-MM-DD'.
+		end_date: A string representing the end date in the format 'YYYY-MM-DD'.
+
+	Returns:
+		A string representing the path of the cache file.
+	"""
+	name = ''.join(c if c.isalnum() else '_' for c in ticker)
+	return f'{MARKET_CACHE_DIR}/.market_cache_{name}_{start_date}_{end_date}.pkl'
+
+def fetch_market_data(ticker: str, start_date: str, end_date: str) -> pd.Series:
+	"""
+	Fetches the closing prices of the market for the specified date range using the yfinance library.
+	This function takes a ticker and a start and end date, and returns a pandas Series of the closing prices.
+	The fetched prices are cached on disk, and the cache is used instead of yfinance until it is MARKET_CACHE_TTL old.
+	Nothing is cached if yfinance returns no data.
+	The cache is best-effort, a cache file which can not be read or written is reported and the prices are fetched.
+
+	Args:
+		ticker: A string representing the ticker symbol of the market.
+		start_date: A string representing the start date in the format 'YYYY-MM-DD'.
+		end_date: A string representing the end date in the format 'YYYY-MM-DD'.
 
 	Returns:
-		A pandas Series of the closing prices for each day in the date range.
+		A pandas Series of the closing prices for each day in the date range, empty if none could be fetched.
+	"""
+	cache_path = get_market_cache_path(ticker, start_date, end_date)
+	if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < MARKET_CACHE_TTL:
+		try:
+			return pd.read_pickle(cache_path)
+		except Exception as e:
+			print(f'Could not read the cached market data {cache_path}, fetching it again: {e}')
+	market_data = yf.Ticker(ticker).history(start=start_date, end=end_date, interval='1d')['Close']
+	if not market_data.empty:
+		try:
+			market_data.to_pickle(cache_path)
+		except OSError as e:
+			print(f'Could not cache the market data in {cache_path}: {e}')
+	return market_data
+
+def get_date_keys(index: pd.DatetimeIndex) -> np.ndarray:
 	"""
-	tz = pytz.timezone('UTC')
-	start_date = tz.localize(datetime.combine(dt.date(year=year_start, month=month_start, day=day_start), datetime.min.time()))
-	end_date = tz.localize(datetime.combine(dt.date(year=year_end, month=month_end, day=day_end), datetime.max.time()))
-	return MARKET_DATA.loc[start_date:end_date]
+	Packs every date of a DatetimeIndex like pack_date, without going through Python objects.
+
+	Args:
+		index: A pandas DatetimeIndex, the time zone and the time of day are ignored.
+
+	Returns:
+		An array of integers representing the dates in the format YYYYMMDD.
+	"""
+	return (index.year * 10000 + index.month * 100 + index.day).to_numpy(dtype=np.int64)
+
+def get_market_close(market_data: pd.Series) -> np.ndarray:
+	"""
+	Aligns the closing prices of the market with the dates in PRICES.
+	This function takes the closing prices of the market and returns them as an array indexed by the rows of PRICES,
+			so that the price of a date can be read without building a date string and going through pandas.
+	The rows are located with a binary search on DATE_KEYS, market dates which are not in PRICES are ignored.
+
+	Args:
+		market_data: A pandas Series of the closing prices of the market, indexed by date.
+
+	Returns:
+		An array of floats with one closing price for every date in PRICES, NaN where the market has no price.
+	"""
+	market_close = np.full(len(DATE_KEYS), np.nan)
+	market_keys = get_date_keys(market_data.index)
+	# Find the row of every market date with a binary search on the sorted dates of PRICES
+	date_ids = np.minimum(np.searchsorted(DATE_KEYS, market_keys), len(DATE_KEYS) - 1)
+	found = DATE_KEYS[date_ids] == market_keys
+	market_close[date_ids[found]] = market_data.to_numpy()[found]
+	return market_close
 
 def get_profits_cost(dates: [(int, int, int)], tickers: [str]=all_tickers) -> \
 		(float, float, float, float, float, float, float, float, float):
@@ -699,44 +1155,106 @@ def get_profits_cost(dates: [(int, int, int)], tickers: [str]=all_tickers) -> \
 		unrealized_profits, unrealized_cost, unrealized_profits_percent, \
 		total_profits, total_cost, total_profits_percent
 
-def get_returns_timespan(
-		dates: [(int, int, int)],
-		tickers: [str]=all_tickers) -> ([float], [float]):
+def get_returns_of_date_ids(
+		date_ids: np.ndarray,
+		tickers: [str]=all_tickers) -> (np.ndarray, np.ndarray, np.ndarray):
 	"""
-	Calculates the returns for a given timespan for the specified market and tickers.
-	This function takes a market ticker, a list of dates, and a list of ticker symbols,
-			and calculates the returns for these tickers and the market over the specified dates.
-	The returns are calculated as the difference in market prices between each consecutive pair of dates.
+	Calculates the returns between each consecutive pair of the specified dates for the market and tickers.
+	The return of the tickers is the total profits in percentage of the pair (see get_profits_cost),
+			and the return of the market is the difference in market prices.
+	All pairs are computed at once from the snapshot matrices and the per-date realized profits.
 
 	Args:
-		market: A string representing the market ticker.
-		dates: A list of tuples, where each tuple represents a date as (year, month, day).
+		date_ids: An array of integers representing the rows in PRICES of the dates,
+				which all need a snapshot and a market price.
 		tickers: A list of strings representing the ticker symbols. Defaults to all tickers.
 
 	Returns:
-		A tuple of two lists of floats. The first list represents the returns for the tickers,
-				and the second list represents the returns for the market.
-	"""
-	market_prices = get_stock_price_yfinance(*dates[0], *dates[-1])
-	ret_market = []
-	ret = []
-	prev_date = None
-	for date in dates:
-		inventory = inventory_snapshot.get(*date)
-		if inventory:
-			try:
-				market_now = market_prices.loc[f'{date[0]}-{str(date[1]).zfill(2)}-{str(date[2]).zfill(2)}']
-				if prev_date:
-					_, _, _, _, _, _, _ , _, r = get_profits_cost([prev_date, date], tickers)
-					market_prev = market_prices.loc[f'{str(prev_date[0]).zfill(4)}-{str(prev_date[1]).zfill(2)}-{str(prev_date[2]).zfill(2)}']
-					ret.append(r)
-					ret_market.append(market_now - market_prev)
-				prev_date = date
-			except Exception as e:
-				pass
-	return ret, ret_market
-
-def get_alpha(dates: [(int, int, int)], tickers: [str]=all_tickers):
+		A tuple of three arrays of floats. The first array represents the returns for the tickers,
+				the second array represents the returns for the market,
+				and the third array represents the market prices on the dates.
+	"""
+	# Realized profits and costs of a pair are the ones of the sells on both of its dates
+	realized_profits_by_date, realized_costs_by_date = trades.profits_costs_by_date(tickers)
+	realized_profits = realized_profits_by_date[date_ids[:-1]] + realized_profits_by_date[date_ids[1:]]
+	realized_cost = realized_costs_by_date[date_ids[:-1]] + realized_costs_by_date[date_ids[1:]]
+
+	# Unrealized profits and costs of a pair are the ones of the snapshot of its second date
+	holdings_rows = inventory_snapshot.holdings_row[date_ids[1:]]
+	unrealized_costs_by_ticker = take_tickers(inventory_snapshot.cost_snap[holdings_rows], tickers)
+	unrealized_profits = (take_tickers(inventory_snapshot.value_snap[date_ids[1:]], tickers) - unrealized_costs_by_ticker).sum(axis=1)
+	unrealized_cost = unrealized_costs_by_ticker.sum(axis=1)
+
+	total_profits = realized_profits + unrealized_profits
+	total_cost = realized_cost + unrealized_cost
+	ret = np.zeros(len(total_cost))
+	np.divide(total_profits, total_cost, out=ret, where=total_cost > EPS)
+	ret *= 100
+	market_prices = MARKET_CLOSE[date_ids]
+	ret_market = np.diff(market_prices)
+	return ret, ret_market, market_prices
+
+def clear_return_caches() -> None:
+	"""
+	Clears the cached returns, month moments, and profit table rows,
+			which have to be recomputed whenever a trade or a snapshot changes.
+	"""
+	get_all_returns.cache_clear()
+	get_month_moments.cache_clear()
+	get_row_values.cache_clear()
+
+@functools.lru_cache(maxsize=None)
+def get_all_returns(tickers: (str, ...)) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+	"""
+	Calculates the returns of the specified tickers and the market over all dates at once.
+	The returns of any date range are a slice of these, see get_returns_range.
+	The returns are cached by tickers until clear_return_caches is called by a trade or a snapshot.
+
+	Args:
+		tickers: A tuple of strings representing the ticker symbols.
+
+	Returns:
+		A tuple of four arrays. The first array represents the rows in PRICES of all dates usable for returns,
+				the second array represents these dates packed by pack_date,
+				the third array represents the returns for the tickers between each consecutive pair of them,
+				and the fourth array represents the returns for the market.
+	"""
+	date_ids = np.flatnonzero(inventory_snapshot.taken & ~np.isnan(MARKET_CLOSE))
+	ret, ret_market, _ = get_returns_of_date_ids(date_ids, tickers=list(tickers))
+	return date_ids, DATE_KEYS[date_ids], ret, ret_market
+
+def get_returns_range(
+		year_start: int, month_start: int, day_start: int,
+		year_end: int, month_end: int, day_end: int,
+		tickers: (str, ...)) -> (np.ndarray, np.ndarray, np.ndarray, int, int):
+	"""
+	Returns the returns of the specified tickers and the market within a date range.
+	This function takes a start and end date, and slices the returns of get_all_returns,
+			which gives the same returns as get_returns_of_date_ids over the dates of the range without computing them.
+
+	Args:
+		year_start: An integer representing the start year.
+		month_start: An integer representing the start month.
+		day_start: An integer representing the start day.
+		year_end: An integer representing the end year.
+		month_end: An integer representing the end month.
+		day_end: An integer representing the end day.
+		tickers: A tuple of strings representing the ticker symbols.
+
+	Returns:
+		A tuple of three arrays and two integers. The arrays represent the returns for the tickers,
+				the returns for the market, and the market prices on the used dates.
+				The returns are views on the cached arrays and must not be modified, the market prices are a copy.
+				The integers represent the positions of the first and last used date in the arrays of get_all_returns,
+				the last one is smaller than the first one if no date is used.
+	"""
+	date_ids, keys, ret, ret_market = get_all_returns(tickers)
+	first = np.searchsorted(keys, pack_date(year_start, month_start, day_start), 'left')
+	end = max(np.searchsorted(keys, pack_date(year_end, month_end, day_end), 'right'), first)
+	pairs = slice(first, max(end - 1, first))
+	return ret[pairs], ret_market[pairs], MARKET_CLOSE[date_ids[first:end]], first, end - 1
+
+def get_alpha(dates: [(int, int, int)], tickers: [str]=all_tickers, returns: float = None, risk_free_rate: float = None):
 	"""
 	Calculates the alpha for the specified dates and tickers.
 	This function takes a list of dates and a list of ticker symbols,
@@ -748,20 +1266,26 @@ def get_alpha(dates: [(int, int, int)], tickers: [str]=all_tickers):
 		R_f represents the risk-free rate of return
 		Beta represents the systematic risk of a portfolio
 		R_m represents the market return, per a benchmark
+	The returns and the total return of the market are sliced from the ones of all dates, see get_returns_range.
 
 	Args:
-		dates: A list of tuples, where each tuple represents a date as (year, month, day).
+		dates: A list of tuples, where each tuple represents a date as (year, month, day), without gaps.
 		tickers: A list of strings representing the ticker symbols. Defaults to all tickers.
+		returns: A float representing the total returns in percentage of the tickers over the dates,
+				as returned by get_profits_cost. Computed if not given.
+		risk_free_rate: A float representing the risk-free rate of return. Defaults to RISK_FREE_RATE.
 
 	Returns:
 		A float representing the alpha for the specified dates and tickers.
 	"""
-	ret_ticker, ret_market = get_returns_timespan(dates, tickers=tickers_interested)
-	market_prices = get_stock_price_yfinance(*dates[0], *dates[-1])
-	total_return_of_market = (market_prices.iloc[-1] - market_prices.iloc[0]) / market_prices.iloc[0] * 100
+	_, ret_market, market_prices, _, _ = get_returns_range(*dates[0], *dates[-1], tuple(tickers))
+	total_return_of_market = (market_prices[-1] - market_prices[0]) / market_prices[0] * 100
 	beta = get_beta(ret_market, ret_market)
-	_, _, _, _, _, _, _ , _, returns = get_profits_cost(dates, tickers=tickers)
-	return returns - RISK_FREE_RATE - beta * (total_return_of_market - RISK_FREE_RATE)
+	if returns is None:
+		_, _, _, _, _, _, _ , _, returns = get_profits_cost(dates, tickers=tickers)
+	if risk_free_rate is None:
+		risk_free_rate = RISK_FREE_RATE
+	return returns - risk_free_rate - beta * (total_return_of_market - risk_free_rate)
 
 def get_beta(ret_ticker: [float], ret_market: [float]):
 	"""
@@ -775,52 +1299,204 @@ def get_beta(ret_ticker: [float], ret_market: [float]):
 	Returns:
 		A float representing the beta between the returns of the ticker and the market.
 	"""
-	covariance = np.cov(ret_ticker, ret_market)[0, 1]
-	variance = np.var(ret_market)
+	ret_ticker = np.asarray(ret_ticker, dtype=np.float64)
+	ret_market = np.asarray(ret_market, dtype=np.float64)
+	n = len(ret_market)
+	dev_market = ret_market - ret_market.mean()
+	# Same normalization as np.cov(ret_ticker, ret_market)[0, 1] and np.var(ret_market), i.e. N - 1 and N
+	covariance = (ret_ticker - ret_ticker.mean()).dot(dev_market) / (n - 1)
+	variance = dev_market.dot(dev_market) / n
 	beta = covariance / variance
 	return beta
 
-def get_std(ret_ticker: [float]):
+@numba.njit(cache=True, error_model='numpy')
+def return_moments_kernel(ret_ticker: np.ndarray, ret_market: np.ndarray) -> (int, float, float, float, float, float):
 	"""
-	Calculates the standard deviation of the returns of a ticker.
-	This function takes a list of floats representing the returns of a ticker,
-			and calculates the standard deviation of these returns.
+	Computes the moments of the returns of a ticker and the market, see merge_return_moments.
+	The means are computed in a first loop, and the squared and cross deviations from them in a second loop,
+			which keeps the results as accurate as the ones of np.std, np.cov, and np.var.
 
 	Args:
-		ret_ticker: A list of floats representing the returns of the ticker.
+		ret_ticker: An array of floats representing the returns of the ticker.
+		ret_market: An array of floats representing the returns of the market, as long as ret_ticker.
 
 	Returns:
-		A float representing the standard deviation of the returns of the ticker.
+		A tuple of the number of returns, the means of the returns of the ticker and the market,
+				the sums of the squared deviations of the ticker and the market,
+				and the sum of the products of the deviations. All zero if there are no returns.
+	"""
+	n = len(ret_ticker)
+	if n == 0:
+		return 0, 0.0, 0.0, 0.0, 0.0, 0.0
+	sum_ticker, sum_market = 0.0, 0.0
+	for i in range(n):
+		sum_ticker += ret_ticker[i]
+		sum_market += ret_market[i]
+	mean_ticker, mean_market = sum_ticker / n, sum_market / n
+	sq_ticker, sq_market, cross = 0.0, 0.0, 0.0
+	for i in range(n):
+		dev_ticker = ret_ticker[i] - mean_ticker
+		dev_market = ret_market[i] - mean_market
+		sq_ticker += dev_ticker * dev_ticker
+		sq_market += dev_market * dev_market
+		cross += dev_ticker * dev_market
+	return n, mean_ticker, mean_market, sq_ticker, sq_market, cross
+
+# Compile (or load from the cache) the kernel once at import instead of on the first table row
+return_moments_kernel(np.arange(2.0), np.arange(2.0))
+
+def get_return_moments(ret_ticker: np.ndarray, ret_market: np.ndarray) -> (int, float, float, float, float, float):
 	"""
-	ret_ticker = np.array(ret_ticker)
-	return np.std(ret_ticker)
+	Computes the moments of the returns of a ticker and the market.
+
+	Args:
+		ret_ticker: An array of floats representing the returns of the ticker.
+		ret_market: An array of floats representing the returns of the market.
 
-def get_sharpe_ratio(ret_ticker: [float]):
+	Returns:
+		A tuple of moments as returned by return_moments_kernel.
 	"""
-	Calculates the Sharpe ratio of the returns of a ticker.
+	return return_moments_kernel(np.asarray(ret_ticker, dtype=np.float64), np.asarray(ret_market, dtype=np.float64))
 
-	This function takes a list of floats representing the returns of a ticker,
-			and calculates the Sharpe ratio of these returns.
-	The Sharpe ratio is calculated as the difference between the average return and the risk-free rate,
-			divided by the volatility of the returns.
-	Sharpe Ratio = (R_x - R_f) / std(R_x)
-		R_x = Expected portfolio return (actual return)
-		R_f = Risk-free rate of return
-		std(R_x) = Standard deviation of portfolio return (or, volatility)
+def merge_return_moments(
+		moments_a: (int, float, float, float, float, float),
+		moments_b: (int, float, float, float, float, float)) -> (int, float, float, float, float, float):
+	"""
+	Merges the moments of two sets of returns into the moments of their union.
+	This function uses the pairwise update of Chan et al.,
+			so the moments of a long timespan can be built from the moments of its parts.
 
 	Args:
-		ret_ticker: A list of floats representing the returns of the ticker.
+		moments_a: A tuple of moments as returned by return_moments_kernel.
+		moments_b: A tuple of moments as returned by return_moments_kernel.
+
+	Returns:
+		A tuple of moments of the returns of both.
+	"""
+	n_a, mean_ticker_a, mean_market_a, sq_ticker_a, sq_market_a, cross_a = moments_a
+	n_b, mean_ticker_b, mean_market_b, sq_ticker_b, sq_market_b, cross_b = moments_b
+	if n_a == 0:
+		return moments_b
+	if n_b == 0:
+		return moments_a
+	n = n_a + n_b
+	delta_ticker = mean_ticker_b - mean_ticker_a
+	delta_market = mean_market_b - mean_market_a
+	weight = n_a * n_b / n
+	return n, mean_ticker_a + delta_ticker * n_b / n, mean_market_a + delta_market * n_b / n, \
+		sq_ticker_a + sq_ticker_b + delta_ticker * delta_ticker * weight, \
+		sq_market_a + sq_market_b + delta_market * delta_market * weight, \
+		cross_a + cross_b + delta_ticker * delta_market * weight
+
+def get_return_stats(
+		moments: (int, float, float, float, float, float),
+		risk_free_rate: float) -> (float, float, float):
+	"""
+	Calculates the standard deviation, beta, and Sharpe ratio of the returns of a ticker from their moments.
+	The covariance is normalized by N - 1 and the variances by N, like np.cov and np.var in get_beta.
+	The Sharpe ratio can not be calculated if the std is zero, 1 is used for the std instead.
+
+	Args:
+		moments: A tuple of moments as returned by return_moments_kernel or merge_return_moments.
+		risk_free_rate: A float representing the risk-free rate of return.
+
+	Returns:
+		A tuple of three floats. The first float represents the standard deviation of the returns of the ticker,
+				the second float represents the beta, and the third float represents the Sharpe ratio.
+	"""
+	n, mean, _, sq_ticker, sq_market, cross = map(np.float64, moments)
+	std = np.sqrt(sq_ticker / n)
+	beta = (cross / (n - 1)) / (sq_market / n)
+
+	sharpe_ratio = (mean - risk_free_rate) / (std or 1.0)
+	return std, beta, sharpe_ratio
+
+@functools.lru_cache(maxsize=None)
+def get_month_moments(year: int, month: int, tickers: (str, ...)) -> ((int, float, float, float, float, float), int, int):
+	"""
+	Computes the moments of the returns of the specified tickers and the market within a month.
+	The moments are cached by month and tickers until clear_return_caches is called by a trade or a snapshot.
+
+	Args:
+		year: An integer representing the year.
+		month: An integer representing the month.
+		tickers: A tuple of strings representing the ticker symbols.
+
+	Returns:
+		A tuple of the moments as returned by return_moments_kernel, and the positions of the first and last date
+				used for them in the arrays of get_all_returns, see get_returns_range.
+	"""
+	ret_ticker, ret_market, _, first, last = get_returns_range(
+		year, month, 1, year, month, monthrange(year, month)[1], tickers)
+	return get_return_moments(ret_ticker, ret_market), first, last
+
+def get_months_moments(months: [(int, int)], tickers: (str, ...)) -> (int, float, float, float, float, float):
+	"""
+	Computes the moments of the returns of the specified tickers and the market over consecutive months.
+	This function merges the moments of each month with the ones of the return between two neighbouring months,
+			which gives the moments of the returns of the whole timespan.
+
+	Args:
+		months: A list of tuples, where each tuple represents a month as (year, month), in chronological order.
+		tickers: A tuple of strings representing the ticker symbols.
 
 	Returns:
-		A float representing the Sharpe ratio of the returns of the ticker.
+		A tuple of moments as returned by merge_return_moments.
+	"""
+	_, _, ret, ret_market = get_all_returns(tickers)
+	moments, last = (0, 0.0, 0.0, 0.0, 0.0, 0.0), -1
+	for year, month in months:
+		moments_month, first_month, last_month = get_month_moments(year, month, tickers)
+		if last_month < first_month:
+			continue
+		if last >= 0:
+			# The return between the last date of the previous month and the first date of this one
+			moments = merge_return_moments(moments, get_return_moments(ret[last:first_month], ret_market[last:first_month]))
+		moments = merge_return_moments(moments, moments_month)
+		last = last_month
+	return moments
+
+@functools.lru_cache(maxsize=None)
+def get_row_values(
+		year_start: int, month_start: int, day_start: int,
+		year_end: int, month_end: int, day_end: int,
+		tickers: (str, ...), risk_free_rate: float) -> \
+		(float, float, float, float, float, float, float, float, float, float, float, float, float, float, float, float):
 	"""
-	returns_array = np.array(ret_ticker)
-	average_return = np.mean(returns_array)
-	volatility = np.std(returns_array)
-	if volatility == 0:
-		volatility = 1
-		print('std is zero, cannot calculate Sharpe ratio. Used 1 for std instead.')
-	return (average_return - RISK_FREE_RATE) / volatility
+	Calculates the values of a row of the profit table for the specified tickers over a date range.
+	The values are cached by date range, tickers, and risk-free rate
+			until clear_return_caches is called by a trade or a snapshot.
+
+	Args:
+		year_start: An integer representing the start year.
+		month_start: An integer representing the start month.
+		day_start: An integer representing the start day.
+		year_end: An integer representing the end year.
+		month_end: An integer representing the end month.
+		day_end: An integer representing the end day.
+		tickers: A tuple of strings representing the ticker symbols.
+		risk_free_rate: A float representing the risk-free rate of return.
+
+	Returns:
+		A tuple of sixteen floats. The first nine floats are the ones returned by get_profits_cost,
+				followed by the cash, portfolio value, assets, standard deviation, beta, alpha, and Sharpe ratio.
+	"""
+	dates = get_all_dates(year_start, month_start, day_start, year_end, month_end, day_end)
+	ticker_list = list(tickers)
+	rp, rc, rpp, up, uc, upp, tp, tc, tpp = get_profits_cost(dates, tickers=ticker_list)
+
+	inventory = inventory_snapshot.get_closest_inventory(*dates[-1])
+
+	cash = inventory.cash(tickers=ticker_list)
+	portfolio = inventory.value(tickers=ticker_list)
+	assets = cash + portfolio
+
+	months = [(year, month) for year in range(year_start, year_end + 1) for month in range(
+		month_start if year == year_start else 1, month_end + 1 if year == year_end else 13)]
+	std, beta, sharpe_ratio = get_return_stats(get_months_moments(months, tickers), risk_free_rate)
+	alpha = get_alpha(dates, tickers=ticker_list, returns=tpp, risk_free_rate=risk_free_rate)
+
+	return rp, rc, rpp, up, uc, upp, tp, tc, tpp, cash, portfolio, assets, std, beta, alpha, sharpe_ratio
 
 # Plottings functions
 def date_label(year: int, month: int, day: int) -> str:
@@ -839,12 +1515,44 @@ def date_label(year: int, month: int, day: int) -> str:
 	"""
 	return f'{year}-{month}-{day}'
 
-def print_profit_table(year_start: str, month_start: str, year_end: str, month_end: str) -> None:
+def get_year_rows(
+		year: int, month_start: int, month_end: int,
+		tickers: (str, ...), risk_free_rate: float) -> [(str, tuple, bool)]:
 	"""
-	Prints a table of the profits for a given range of dates.
-	This function takes a start year and month, and an end year and month, 
-			and prints a table of the profits for each month in this range.
-	The table includes the realized and unrealized profits, total profits, cash, portfolio value, assets,
+	Calculates the rows of the profit table of a year.
+	This function takes a year and the range of its months to show,
+			and returns a row for each of these months followed by the row of the whole year.
+	Years do not depend on each other, so the rows of several years can be calculated in parallel.
+
+	Args:
+		year: An integer representing the year.
+		month_start: An integer representing the first month to show.
+		month_end: An integer representing the last month to show.
+		tickers: A tuple of strings representing the ticker symbols.
+		risk_free_rate: A float representing the risk-free rate of return.
+
+	Returns:
+		A list of tuples, where each tuple contains the label of the row, the values returned by get_row_values,
+				and whether the row is followed by a divider.
+	"""
+	rows = []
+	for month in range(month_start, month_end + 1):
+		_, _, day_start = get_first_available_date(year, month, 1, inventory_snapshot.keys)
+		all_dates = get_all_dates(year, month, day_start, year, month, monthrange(year, month)[1])
+		rows.append((month, get_row_values(*all_dates[0], *all_dates[-1], tickers, risk_free_rate), month == month_end))
+
+	all_dates = get_all_dates_year(year, inventory_snapshot.keys)
+	rows.append(('Annual', get_row_values(*all_dates[0], *all_dates[-1], tickers, risk_free_rate), False))
+	return rows
+
+def get_profit_tables(
+		year_start: str, month_start: str, year_end: str, month_end: str,
+		tickers: [str] = None, risk_free_rate: float = None, workers: int = 1) -> ([PrettyTable], int):
+	"""
+	Builds the tables of the profits for a given range of dates.
+	This function takes a start year and month, and an end year and month,
+			and builds a table of the profits for each month of every year in this range, and a table of the whole range.
+	The tables include the realized and unrealized profits, total profits, cash, portfolio value, assets,
 			standard deviation, beta, alpha, and Sharpe ratio.
 
 	Args:
@@ -852,57 +1560,47 @@ def print_profit_table(year_start: str, month_start: str, year_end: str, month_e
 		month_start: A string representing the start month.
 		year_end: A string representing the end year.
 		month_end: A string representing the end month.
+		tickers: A list of strings representing the ticker symbols. Defaults to tickers_interested.
+		risk_free_rate: A float representing the risk-free rate of return. Defaults to RISK_FREE_RATE.
+		workers: An integer representing the number of processes the rows of the years are calculated in.
+				Defaults to 1, i.e. no extra processes. Only used where processes can be forked.
 
 	Returns:
-		None. The function prints the table to the console.
+		A tuple of the list of tables, one for every year followed by the one of the whole range,
+				and an integer representing the number of rows whose std is zero.
 	"""
-	def row_values(dates: [(int, int, int)]) -> \
-			(float, float, float, float, float, float, float, float, float, float, float, float, float):
-		rp, rc, rpp, up, uc, upp, tp, tc, tpp = get_profits_cost(dates, tickers=tickers_interested)
-
-		inventory = inventory_snapshot.get_closest_inventory(*all_dates[-1])
-
-		cash = inventory.cash(tickers=tickers_interested)
-		portfolio = inventory.value(tickers=tickers_interested)
-		assets = cash + portfolio
-
-		ret_ticker, ret_market = get_returns_timespan(all_dates, tickers=tickers_interested)
-
-		std = get_std(ret_ticker)
-		beta = get_beta(ret_ticker, ret_market)
-		alpha = get_alpha(dates, tickers=tickers_interested)
-		sharpe_ratio = get_sharpe_ratio(ret_ticker)
-
-		return rp, rc, rpp, up, uc, upp, tp, tc, tpp, cash, portfolio, assets, std, beta, alpha, sharpe_ratio
-	
-	def add_row(dates: [(int, int, int)], label: str, table, divider: bool) -> None:
-		rp, _, rpp, up, _, upp, tp, _, tpp, cash, portfolio, assets, std, beta, alpha, sharpe_ratio = row_values(dates)
-		table.add_row([
-			label,
-
-			'%.2f' % rp,
-			'%.4f' % rpp,
-
-			'%.2f' % up,
-			'%.4f' % upp,
-
-			'%.2f' % tp,
-			'%.4f' % tpp,
-
-			'%.2f' % cash,
-			'%.2f' % portfolio,
-			'%.2f' % assets,
-
-			'%.2f' % std,
-			'%.4f' % beta,
-			'%.4f' % alpha,
-			'%.4f' % sharpe_ratio,
-		], divider=divider)
-	
-	global out
+	tables = []
+	zero_std_rows = 0
+
+	def add_row(row_values: tuple, label: str, table, divider: bool) -> None:
+		nonlocal zero_std_rows
+		rp, _, rpp, up, _, upp, tp, _, tpp, cash, portfolio, assets, std, beta, alpha, sharpe_ratio = row_values
+		zero_std_rows += int(std == 0)
+		values = (rp, rpp, up, upp, tp, tpp, cash, portfolio, assets, std, beta, alpha, sharpe_ratio)
+		table.add_row([label, *[fmt % value for fmt, value in zip(ROW_FORMATS, values)]], divider=divider)
+
+	tickers = tuple(tickers_interested if tickers is None else tickers)
+	if risk_free_rate is None:
+		risk_free_rate = RISK_FREE_RATE
 	year_start, month_start, year_end, month_end = map(int, [year_start, month_start, year_end, month_end])
-	year_end, month_end, _ = get_closest_available_date(year_end, month_end, 31, inventory_snapshot.snapshot)
-	for year in range(year_start, year_end + 1):
+	year_end, month_end, _ = get_closest_available_date(year_end, month_end, 31, inventory_snapshot.keys)
+	years = list(range(year_start, year_end + 1))
+	month_starts = [month_start if year == year_end else 1 for year in years]
+	month_ends = [month_end if year == year_end else 12 for year in years]
+	get_rows = functools.partial(get_year_rows, tickers=tickers, risk_free_rate=risk_free_rate)
+	if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+		# Forked processes inherit the prices, snapshots, trades, and caches, nothing has to be sent to them.
+		# The moments of all months are computed before forking, so that neither the workers
+		# nor the Sum row below have to compute them again.
+		for year in years:
+			for month in range(1, 13):
+				get_month_moments(year, month, tickers)
+		with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+			year_rows = list(executor.map(get_rows, years, month_starts, month_ends))
+	else:
+		year_rows = list(map(get_rows, years, month_starts, month_ends))
+
+	for year, rows in zip(years, year_rows):
 		annual_table = PrettyTable()
 		annual_table.title = str(year)
 		annual_table.field_names = [
@@ -927,14 +1625,9 @@ def print_profit_table(year_start: str, month_start: str, year_end: str, month_e
 			'Sharpe Ratio'
 		]
 
-		for month in range(month_start if year == year_end else 1, month_end + 1 if year == year_end else 13):
-			day_start = list(inventory_snapshot.snapshot[year][month])[0]
-			all_dates = get_all_dates(year, month, day_start, year, month, monthrange(year, month)[1])
-			add_row(all_dates, month, annual_table, month == (month_end if year == year_end else 12))
-		
-		all_dates = get_all_dates_year(year, inventory_snapshot.snapshot)
-		add_row(all_dates, 'Annual', annual_table, False)
-		print(annual_table)	
+		for label, row_values, divider in rows:
+			add_row(row_values, label, annual_table, divider)
+		tables.append(annual_table)
 
 	table = PrettyTable()
 	table.title = f'From {year_start}-{month_start} to {year_end}-{month_end}'
@@ -959,38 +1652,66 @@ def print_profit_table(year_start: str, month_start: str, year_end: str, month_e
 		'Alpha',
 		'Sharpe Ratio'
 	]
-	all_dates = get_all_dates(year_start, month_start, list(inventory_snapshot.snapshot[year_start][month_start])[0],
+	_, _, day_start = get_first_available_date(year_start, month_start, 1, inventory_snapshot.keys)
+	all_dates = get_all_dates(year_start, month_start, day_start,
 			year_end, month_end, monthrange(year_end, month_end)[1])
-	add_row(all_dates, 'Sum', table, False)
-	print(table)	
+	add_row(get_row_values(*all_dates[0], *all_dates[-1], tickers, risk_free_rate), 'Sum', table, False)
+	tables.append(table)
+	return tables, zero_std_rows
+
+def print_profit_table(
+		year_start: str, month_start: str, year_end: str, month_end: str,
+		tickers: [str] = None, risk_free_rate: float = None, workers: int = 1) -> None:
+	"""
+	Prints a table of the profits for a given range of dates.
+	This function takes a start year and month, and an end year and month,
+			and prints the tables built by get_profit_tables.
+	Rows whose std is zero are counted and reported once after the tables.
+
+	Args:
+		year_start: A string representing the start year.
+		month_start: A string representing the start month.
+		year_end: A string representing the end year.
+		month_end: A string representing the end month.
+		tickers: A list of strings representing the ticker symbols. Defaults to tickers_interested.
+		risk_free_rate: A float representing the risk-free rate of return. Defaults to RISK_FREE_RATE.
+		workers: An integer representing the number of processes the rows of the years are calculated in.
+				Defaults to 1, i.e. no extra processes. Only used where processes can be forked.
+
+	Returns:
+		None. The function prints the table to the console.
+	"""
+	tables, zero_std_rows = get_profit_tables(
+		year_start, month_start, year_end, month_end,
+		tickers=tickers, risk_free_rate=risk_free_rate, workers=workers)
+	for table in tables:
+		print(table)
+	if zero_std_rows:
+		print(f'std is zero in {zero_std_rows} rows, cannot calculate Sharpe ratio. Used 1 for std instead.')
 
 if __name__ == '__main__':
-	year_start, month_start, day_start = '2010', '01', '01'
-	year_end, month_end, day_end = '2023', '12', '31'
 	# read prices
-	with open(PRICES_FILE, newline='') as file:
-		reader = csv.reader(file, delimiter=',')
-		labels = next(reader)
-
-		# Store ticker names
-		all_tickers = [ticker for ticker in labels[1:]]
-
-		# Store the prices for each ticker on each day
-		first = True
-		for row in reader:
-			try:
-				year, month, day = get_date(row[0])
-				if first:
-					year_start, month_start, day_start = year, month, day
-					first = False
-				# Creating a dictionary for each ticker and its price on that day
-				prices = {ticker: float(row[i]) for i, ticker in enumerate(all_tickers, start=1)}
-				# Storing the prices in the nested dictionary
-				price_daily.setdefault(year, {}).setdefault(month, {})[day] = prices
-				update_dates.append(row[0])
-				year_end, month_end, day_end = year, month, day
-			except Exception as e:
-				print(f'An error occured while reading PRICES_FILE at the line: {row}. Exception: {e}')
+	prices_df = pd.read_csv(PRICES_FILE)
+
+	# Store ticker names
+	all_tickers = prices_df.columns[1:].to_list()
+	TICKER_IDX = {ticker: i for i, ticker in enumerate(all_tickers)}
+
+	# Store the prices for each ticker on each day, rows which can not be parsed are skipped
+	# The prices only have float32 precision to begin with, so storing them as float32 halves the memory moved
+	# without losing accuracy. All arithmetic on them is done in float64.
+	dates = pd.to_datetime(prices_df.iloc[:, 0], format='%Y-%m-%d', errors='coerce')
+	prices = prices_df.iloc[:, 1:].apply(pd.to_numeric, errors='coerce')
+	valid = dates.notna() & prices.notna().all(axis=1)
+	for row in prices_df[~valid].itertuples(index=False):
+		print(f'An error occured while reading PRICES_FILE at the line: {list(row)}.')
+	dates = pd.DatetimeIndex(dates[valid])
+	PRICES = prices[valid].to_numpy(dtype=np.float32)
+	DATE_IDX = {date: i for i, date in enumerate(zip(dates.year.tolist(), dates.month.tolist(), dates.day.tolist()))}
+	DATE_KEYS = get_date_keys(dates)
+	update_dates = prices_df.iloc[:, 0][valid].to_list()
+	year_start, month_start, day_start = unpack_date(DATE_KEYS[0])
+	year_end, month_end, day_end = unpack_date(DATE_KEYS[-1])
 
 	inventory_curr = Inventory(tickers_interested=all_tickers)
 	inventory_snapshot = InventorySnapshot()
@@ -999,29 +1720,29 @@ if __name__ == '__main__':
 	# Read market data
 	start_date = f'{year_start}-{month_start}-{day_start}'
 	end_date = f'{year_end}-{month_end}-{day_end}'
-	df = yf.Ticker(MARKET_TICKER).history(start=start_date, end=end_date, interval='1d')['Close']
+	df = fetch_market_data(MARKET_TICKER, start_date, end_date)
 	if not df.empty:
 		MARKET_DATA = df
 	else:
-		df = pd.read_csv(MARKET_FILE)
+		df = pd.read_csv(MARKET_FILE, usecols=['Date', 'Close'])
 		df['Date'] = pd.to_datetime(df['Date'])
 		df.set_index('Date', inplace=True)
-		filtered_df = df.loc[start_date:end_date]['Close']
-		MARKET_DATA = filtered_df
+		# The file is sorted by date, so the date range is found with a binary search and sliced by position
+		keys = get_date_keys(df.index)
+		start = np.searchsorted(keys, pack_date(year_start, month_start, day_start), 'left')
+		end = np.searchsorted(keys, pack_date(year_end, month_end, day_end), 'right')
+		MARKET_DATA = df['Close'].iloc[start:end]
+	MARKET_CLOSE = get_market_close(MARKET_DATA)
 	
-	with open(TRANSACTIONS_FILE, newline='') as csvfile:
-		global update_date
-		reader = csv.reader(csvfile, delimiter=',')
-		next(reader) # skip labels
-		update_date = update_dates.pop(0)
-		for row in reader:
-			while update_date != row[0]:
-				daily_update(*get_date(update_date))
-				update_date = update_dates.pop(0)
-			process_trade(*get_date(update_date), row[1], int(row[2]), row[3])
-		for date in update_dates:
-			daily_update(*get_date(date))
+	transactions = pd.read_csv(TRANSACTIONS_FILE)
+	transaction_dates = pd.DatetimeIndex(pd.to_datetime(transactions.iloc[:, 0], format='%Y-%m-%d'))
+	replay_trades(
+		list(zip(transaction_dates.year.tolist(), transaction_dates.month.tolist(), transaction_dates.day.tolist())),
+		transactions.iloc[:, 1].to_list(), transactions.iloc[:, 2].to_numpy(), transactions.iloc[:, 3].to_numpy())
+	trades.sort_by_date()
 
 	for ticker in all_tickers:
 		tickers_interested.append(ticker)
-	print_profit_table(year_start, month_start, year_end, month_end)
+	print_profit_table(
+		year_start, month_start, year_end, month_end,
+		tickers=tickers_interested, risk_free_rate=RISK_FREE_RATE, workers=1)